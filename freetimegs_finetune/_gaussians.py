@@ -15,12 +15,36 @@
 # with this program. If not, see <https://www.gnu.org/licenses/>.
 
 
+import math
 from math import isqrt
 from typing import Optional
 
 import gsplat
 import torch
 from torch import Tensor, nn
+from torch.nn import functional as F
+
+# parameters kept in fp32 by DynamicGaussians.save: means and velocities for
+# positional precision, times because fp16 rounding (up to ~4 ms at t >= 8 s) is
+# not negligible against short durations exp(durations)
+_FULL_PRECISION_KEYS = ("means", "times", "velocities")
+
+
+@torch.compile(fullgraph=True, dynamic=False)
+def _compute_means_and_opacity(
+    means: Tensor,
+    times: Tensor,
+    velocities: Tensor,
+    opacities: Tensor,
+    durations: Tensor,
+    t: Tensor,
+) -> tuple[Tensor, Tensor]:
+    dt = t - times
+    means_t = means + dt * velocities
+    opacities_t = torch.sigmoid(opacities) * torch.exp(
+        -0.5 * (dt * torch.exp(-durations)) ** 2
+    )
+    return means_t, opacities_t.squeeze(-1)
 
 
 class DynamicGaussians(nn.Module):
@@ -28,14 +52,14 @@ class DynamicGaussians(nn.Module):
     scales: nn.Parameter  # (n, 3)
     quats: nn.Parameter  # (n, 4)
     opacities: nn.Parameter  # (n, 1)
-    sh_0: nn.Parameter  # (n, 1, 3)
-    sh_n: nn.Parameter  # (n, (sh_degree + 1) ** 2 - 1, 3)
+    sh: nn.Parameter  # (n, (sh_degree + 1) ** 2, 3), sh_0 and sh_n are views into it
 
     times: nn.Parameter  # (n, 1)
     durations: nn.Parameter  # (n, 1)
     velocities: nn.Parameter  # (n, 3)
 
     sh_degree: int
+    _frozen: bool = False
 
     def __init__(
         self,
@@ -43,25 +67,42 @@ class DynamicGaussians(nn.Module):
         scales: Tensor,
         quats: Tensor,
         opacities: Tensor,
-        sh_0: Tensor,
-        sh_n: Tensor,
+        sh_0: Optional[Tensor],
+        sh_n: Optional[Tensor],
         times: Tensor,
         durations: Tensor,
         velocities: Tensor,
+        *,
+        sh: Optional[Tensor] = None,
     ):
+        """SH coefficients are given either as sh_0 / sh_n or, already merged, as sh."""
         super().__init__()
 
+        if sh is None:
+            if sh_0 is None or sh_n is None:
+                raise ValueError("Either sh or both sh_0 and sh_n must be given")
+            sh = torch.cat([sh_0.float(), sh_n.float()], dim=1)
+        elif sh_0 is not None or sh_n is not None:
+            raise ValueError("sh cannot be combined with sh_0 / sh_n")
+
         self.means = nn.Parameter(means.float())
         self.scales = nn.Parameter(scales.float())
         self.quats = nn.Parameter(quats.float())
         self.opacities = nn.Parameter(opacities.float())
-        self.sh_0 = nn.Parameter(sh_0.float())
-        self.sh_n = nn.Parameter(sh_n.float())
+        self.sh = nn.Parameter(sh.float())
         self.times = nn.Parameter(times.float())
         self.durations = nn.Parameter(durations.float())
         self.velocities = nn.Parameter(velocities.float())
 
-        self.sh_degree = isqrt(sh_n.shape[1] + 1) - 1
+        self.sh_degree = isqrt(sh.shape[1]) - 1
+
+    @property
+    def sh_0(self) -> Tensor:
+        return self.sh[:, :1]  # (n, 1, 3)
+
+    @property
+    def sh_n(self) -> Tensor:
+        return self.sh[:, 1:]  # (n, (sh_degree + 1) ** 2 - 1, 3)
 
     def forward(
         self,
@@ -72,7 +113,11 @@ class DynamicGaussians(nn.Module):
         clamp: bool = True,
         sh_degree: Optional[int] = None,
     ):
-        means_t = self.means + (t - self.times) * self.velocities
+        # pass t as a tensor so the compiled kernel is not specialized per frame
+        t = torch.as_tensor(t, dtype=self.times.dtype, device=self.times.device)
+        means_t, opacities_t = _compute_means_and_opacity(
+            self.means, self.times, self.velocities, self.opacities, self.durations, t
+        )
         scales = torch.exp(self.scales)
 
         if sh_degree is None:
@@ -82,8 +127,8 @@ class DynamicGaussians(nn.Module):
             means=means_t,
             quats=self.quats,
             scales=scales,
-            opacities=self.temporal_opacity(t).squeeze(-1),
-            colors=torch.cat([self.sh_0, self.sh_n], dim=1),
+            opacities=opacities_t,
+            colors=self.sh,
             viewmats=w2c,
             Ks=intrinsic,
             sh_degree=sh_degree,
@@ -91,21 +136,54 @@ class DynamicGaussians(nn.Module):
             height=shape[0],
         )
         if clamp:
-            image = image.clone().clamp(0, 1)
+            image = image.clamp(0, 1)
 
         return image, alpha, meta
 
+    def freeze_for_inference(self):
+        """Caches exp(-durations) and sigmoid(opacities) for the temporal opacity methods.
+
+        Parameters stop requiring grad; the cache is not refreshed if they change afterwards.
+        """
+        self.requires_grad_(False)
+        self.register_buffer("_inv_dur", torch.exp(-self.durations), persistent=False)
+        self.register_buffer("_base_op", torch.sigmoid(self.opacities), persistent=False)
+        self._frozen = True
+
+    def _opacity_terms(self) -> tuple[Tensor, Tensor]:
+        """Returns (sigmoid(opacities), exp(-durations)), both (n, 1)"""
+        if self._frozen:
+            return self._base_op, self._inv_dur
+        return torch.sigmoid(self.opacities), torch.exp(-self.durations)
+
     def temporal_opacity(self, t: float | Tensor) -> Tensor:
-        return torch.sigmoid(self.opacities) * torch.exp(
-            -0.5 * ((t - self.times) / self.durations.exp()) ** 2
-        )
+        base, inv_dur = self._opacity_terms()
+        return base * torch.exp(-0.5 * ((t - self.times) * inv_dur) ** 2)
+
+    def temporal_opacity_batch(self, ts: Tensor, dtype: Optional[torch.dtype] = None) -> Tensor:
+        """Returns temporal opacities of shape (n, T) for a vector of T times"""
+        base, inv_dur = self._opacity_terms()  # (n, 1)
+        # the time offset stays in full precision, bf16 cannot resolve 1 / fps steps
+        z = (ts[None, :] - self.times) * inv_dur  # (n, T)
+        if dtype is not None:
+            z, base = z.to(dtype), base.to(dtype)
+        return base * torch.exp(-0.5 * z**2)
+
     def temporal_opacity_logit(self, t: float | Tensor) -> Tensor:
         """Returns opacity in logit space (before sigmoid) at time t"""
-        temporal_opacity_sigmoid = self.temporal_opacity(t)
-        # Apply logit (inverse sigmoid): logit(y) = log(y / (1 - y))
-        # Clamp to avoid log(0) or log(negative)
-        temporal_opacity_clamped = temporal_opacity_sigmoid.clamp(1e-8, 1 - 1e-8)
-        return torch.logit(temporal_opacity_clamped) 
+        # logit(y) = log(y) - log(1 - y) in closed form, no sigmoid -> logit round-trip
+        # log(y) = log(sigmoid(o)) + log(gauss) = -softplus(-o) - 0.5 * z ** 2, y clamped to [1e-8, 1 - 1e-8]
+        _, inv_dur = self._opacity_terms()
+        log_p = -F.softplus(-self.opacities) - 0.5 * ((t - self.times) * inv_dur) ** 2
+        log_p = log_p.clamp(math.log(1e-8), math.log1p(-1e-8))
+        # log(1 - y): expm1 is accurate near y = 1, log1p elsewhere; each branch's input is
+        # clamped to its own side so the unselected one stays finite and its gradient is not NaN
+        log_1mp = torch.where(
+            log_p > -math.log(2),
+            torch.log(-torch.expm1(log_p.clamp_min(-math.log(2)))),
+            torch.log1p(-torch.exp(log_p).clamp_max(0.5)),
+        )
+        return log_p - log_1mp
 
     # custom code
     def temporal_means(self, t: float | Tensor) -> Tensor:
@@ -126,32 +204,57 @@ class DynamicGaussians(nn.Module):
         )
 
     def __or__(self, other):
-        return self.__class__(
-            means=torch.cat([self.means, other.means]),
-            scales=torch.cat([self.scales, other.scales]),
-            quats=torch.cat([self.quats, other.quats]),
-            opacities=torch.cat([self.opacities, other.opacities]),
-            sh_0=torch.cat([self.sh_0, other.sh_0]),
-            sh_n=torch.cat([self.sh_n, other.sh_n]),
-            times=torch.cat([self.times, other.times]),
-            durations=torch.cat([self.durations, other.durations]),
-            velocities=torch.cat([self.velocities, other.velocities]),
-        )
+        with torch.no_grad():
+            return self.__class__(
+                means=torch.cat([self.means, other.means]),
+                scales=torch.cat([self.scales, other.scales]),
+                quats=torch.cat([self.quats, other.quats]),
+                opacities=torch.cat([self.opacities, other.opacities]),
+                sh_0=None,
+                sh_n=None,
+                times=torch.cat([self.times, other.times]),
+                durations=torch.cat([self.durations, other.durations]),
+                velocities=torch.cat([self.velocities, other.velocities]),
+                sh=torch.cat([self.sh, other.sh]),
+            )
 
     def __len__(self) -> int:
         return len(self.means)
 
     def save(self, path: str):
-        torch.save(self, path)
+        """Saves the parameters as a dict, in fp16 except for _FULL_PRECISION_KEYS.
+
+        Paths ending in .safetensors are written with safetensors, others with torch.save.
+        """
+        state = {
+            k: (v if k in _FULL_PRECISION_KEYS else v.half()).contiguous()
+            for k, v in self.state_dict().items()
+        }
+        if path.endswith(".safetensors"):
+            from safetensors.torch import save_file
+
+            save_file(state, path)
+        else:
+            torch.save(state, path)
 
     def save_dict(self, path: str):
         torch.save(self.state_dict(), path)
 
     @classmethod
     def load(cls, path: str):
-        obj = torch.load(path, weights_only=False)
+        if path.endswith(".safetensors"):
+            from safetensors.torch import load_file
+
+            obj = load_file(path)
+        else:
+            obj = torch.load(path, weights_only=False)
         if isinstance(obj, cls):
-            return obj
-        elif isinstance(obj, dict):
+            if "sh" in obj._parameters:
+                return obj
+            # module pickled before sh_0 / sh_n were merged into sh
+            obj = {k: v.data for k, v in obj._parameters.items()}
+        if isinstance(obj, dict):
+            if "sh" in obj:
+                return cls(sh_0=None, sh_n=None, **obj)
             return cls(**obj)
             
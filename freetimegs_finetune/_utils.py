@@ -1,8 +1,62 @@
+import math
+import os
+from typing import Optional
 import torch
 from _gaussians import DynamicGaussians
 from pathlib import Path
 import gsplat
 
+try:
+    import triton
+    import triton.language as tl
+    TRITON_AVAILABLE = True
+except ImportError:
+    TRITON_AVAILABLE = False
+
+if TRITON_AVAILABLE:
+    @triton.jit
+    def _static_entropy_kernel(opac_ptr, time_ptr, dur_ptr, out_ptr, N, T, fps, logT,
+                               entropy_threshold, eps, min_opacity, BLOCK_N: tl.constexpr):
+        # BLOCK_N gaussians per program; temporal opacities are generated and
+        # reduced frame by frame in registers, never written to memory
+        offs = tl.program_id(0).to(tl.int64) * BLOCK_N + tl.arange(0, BLOCK_N)
+        mask = offs < N
+        base = tl.sigmoid(tl.load(opac_ptr + offs, mask=mask, other=0.0))
+        mu = tl.load(time_ptr + offs, mask=mask, other=0.0)
+        inv_dur = tl.exp(-tl.load(dur_ptr + offs, mask=mask, other=0.0))
+
+        row_sum = tl.zeros((BLOCK_N,), dtype=tl.float32)
+        xlx = tl.zeros((BLOCK_N,), dtype=tl.float32)
+        peak = tl.zeros((BLOCK_N,), dtype=tl.float32)
+        for i in range(T):
+            z = (i / fps - mu) * inv_dur
+            a = base * tl.exp(-0.5 * z * z)
+            row_sum += a
+            xlx += a * tl.log(tl.maximum(a, eps))
+            peak = tl.maximum(peak, a)
+
+        row_sum += eps
+        H = tl.log(row_sum) - xlx / row_sum
+        tl.store(out_ptr + offs, (peak > min_opacity) & (H / logT >= entropy_threshold), mask=mask)
+
+def _static_entropy_triton(gs: DynamicGaussians,
+                           num_frames: int,
+                           fps: float,
+                           entropy_threshold: float,
+                           eps: float,
+                           min_opacity: float,
+                           block_n: int = 128):
+    N = len(gs)
+    opacities = gs.opacities.detach().reshape(-1).contiguous()
+    times = gs.times.detach().reshape(-1).contiguous()
+    durations = gs.durations.detach().reshape(-1).contiguous()
+    idx_entropy = torch.empty(N, dtype=torch.bool, device=times.device)
+    if N > 0:
+        _static_entropy_kernel[(triton.cdiv(N, block_n),)](
+            opacities, times, durations, idx_entropy, N, num_frames, float(fps), math.log(num_frames),
+            entropy_threshold, eps, min_opacity, BLOCK_N=block_n)
+    return idx_entropy
+
 def entropy_indices(x: torch.Tensor,
                                     entropy_threshold: float = 0.75,
                                     eps: float = 1e-12):
@@ -12,46 +66,73 @@ def entropy_indices(x: torch.Tensor,
     """
 
     N, T = x.shape
-    logT = torch.log(torch.tensor(float(T), dtype=x.dtype, device=x.device))
+    logT = torch.log(torch.tensor(float(T), dtype=torch.float32, device=x.device))
 
     # --- (1) Entropy uniformity ---
-    row_sum = x.sum(dim=1, keepdim=True) + eps           # [N,1]
-    p = x / row_sum                                       # [N,T], sums to 1 per row (normalized)
-    H = -(p * (p.add_(eps).log())).sum(dim=1)            # entropy per row
+    # H(p) = log(S) - sum(x * log(x)) / S with S = sum(x), so p = x / S is never materialized
+    # element-wise terms may be bf16, the reductions accumulate in fp32
+    lx = torch.log(x.clamp_min(eps))                      # [N,T]
+    row_sum = x.sum(dim=1, dtype=torch.float32) + eps     # [N]
+    H = torch.log(row_sum) - (x * lx).sum(dim=1, dtype=torch.float32) / row_sum  # entropy per row
     u = H / logT                                          # normalized entropy in [0,1]
     idx_entropy = u >= entropy_threshold
 
     return idx_entropy
 
+@torch.no_grad()
 def evenly_distributed_bool(gs: DynamicGaussians,
                                entropy_threshold: float = 0.75,
-                               eps: float = 1e-12):
+                               eps: float = 1e-12,
+                               min_opacity: float = 1e-4,
+                               dtype: Optional[torch.dtype] = None):
     """
+    Gaussians whose opacity never exceeds min_opacity are invisible in every
+    frame; they are reported as non-static without computing their entropy.
+
+    By default every backend evaluates in fp32 and yields the same mask; a
+    lower-precision dtype (e.g. torch.bfloat16) is opt-in and may flip rows
+    close to entropy_threshold.
+
     Returns:
     idx_entropy: bool where normalized entropy >= entropy_threshold
     """
     fps = 30
+    num_frames = 300
+
+    if TRITON_AVAILABLE and gs.times.is_cuda and dtype is None:
+        # opacity, prefilter and entropy fused in one kernel, no [N,T] matrix
+        return _static_entropy_triton(gs, num_frames, fps, entropy_threshold, eps, min_opacity)
     
-    opacity_list = [gs.temporal_opacity(idx / fps).squeeze(-1) for idx in range(300)]
-    opacities = torch.stack(opacity_list, dim=1)
-    return entropy_indices(opacities, entropy_threshold, eps)
+    ts = torch.arange(num_frames, dtype=gs.times.dtype, device=gs.times.device) / fps  # (T,)
+    opacities = gs.temporal_opacity_batch(ts, dtype)
+
+    keep = opacities.max(dim=1).values > min_opacity      # [N]
+    idx_entropy = torch.zeros_like(keep)
+    idx_entropy.masked_scatter_(keep, entropy_indices(opacities[keep], entropy_threshold, eps))
+    return idx_entropy
 
 if __name__ == "__main__":
+    # must be set before CUDA is initialized
+    os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True")
+
     frame_idx = 2
 
     fps = 30
     t = frame_idx / fps
     gs = DynamicGaussians.load("gaussians_dict.pt")
-    opacity_bool = gs.temporal_opacity(t).squeeze(-1) > 0.005
+    gs.freeze_for_inference()
+    means_t = gs.temporal_means(t)
+    opacity_logit = gs.temporal_opacity_logit(t).squeeze(-1)
+    opacity_bool = torch.sigmoid(opacity_logit) > 0.005
 
     static_bool = evenly_distributed_bool(gs)
     # static_bool = evenly_distributed_bool(gs, entropy_threshold=0.85)
     # static_bool = evenly_distributed_bool(gs, entropy_threshold=0.95)
 
-    means = gs.temporal_means(t)[static_bool]
+    means = means_t[static_bool]
     scales = gs.scales[static_bool]
     quats = gs.quats[static_bool]
-    opacities = gs.temporal_opacity_logit(t).squeeze(-1)[static_bool]
+    opacities = opacity_logit[static_bool]
     sh_0 = gs.sh_0[static_bool]
     sh_n = gs.sh_n[static_bool]
 
@@ -60,10 +141,10 @@ if __name__ == "__main__":
 
     # opacity
     gsplat.export_splats(
-        means=gs.temporal_means(t)[opacity_bool],
+        means=means_t[opacity_bool],
         scales=gs.scales[opacity_bool],
         quats=gs.quats[opacity_bool],
-        opacities=gs.temporal_opacity_logit(t).squeeze(-1)[opacity_bool],
+        opacities=opacity_logit[opacity_bool],
         sh0=gs.sh_0[opacity_bool],
         shN=gs.sh_n[opacity_bool],
         format="ply",
@@ -82,10 +163,10 @@ if __name__ == "__main__":
     #     save_to=str(file_path / f"static_{frame_idx:03d}.ply"),
     # )
 
-    # d_means = gs.temporal_means(t)[~static_idx]
+    # d_means = means_t[~static_idx]
     # d_scales = gs.scales[~static_idx]
     # d_quats = gs.quats[~static_idx]
-    # d_opacities = gs.temporal_opacity_logit(t).squeeze(-1)[~static_idx]
+    # d_opacities = opacity_logit[~static_idx]
     # d_sh_0 = gs.sh_0[~static_idx]
     # d_sh_n = gs.sh_n[~static_idx]
 
@@ -9,10 +9,56 @@ Usage:
 import os
 import json
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from operator import itemgetter
 from pathlib import Path
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+METRIC_KEYS = ('PSNR', 'DSSIM_1', 'DSSIM_2', 'LPIPS_alex')
+# bound once; rows missing a metric fall back to dict.get (None default)
+get_metrics = itemgetter(*METRIC_KEYS)
+
+
+def load_frame(model_path, frame_num):
+    """Reads frame_<n>/results.json and returns (iteration, PSNR, DSSIM_1, DSSIM_2, LPIPS_alex) rows, or None if unavailable."""
+    results_file = model_path / f"frame_{frame_num}" / "results.json"
+    
+    if not results_file.exists():
+        return None
+    
+    try:
+        with open(results_file, 'rb') as f:
+            results = orjson.loads(f.read()) if ORJSON_AVAILABLE else json.load(f)
+        
+        rows = []
+        
+        # Extract metrics for each iteration
+        for iteration_key, metrics in results.items():
+            # Extract iteration number from key like "ours_1000"
+            iteration = int(iteration_key.replace("ours_", ""))
+            
+            if iteration in (1, 6000):
+                try:
+                    values = get_metrics(metrics)
+                except KeyError:
+                    values = tuple(metrics.get(key, None) for key in METRIC_KEYS)
+                rows.append((iteration, *values))
+    
+    except Exception as e:
+        print(f"Error reading frame {frame_num}: {e}")
+        return None
+    
+    return rows
+
 
 def main():
     parser = argparse.ArgumentParser(description="Export metrics from results.json to Excel")
@@ -33,66 +79,51 @@ def main():
         print(f"Error: Model path does not exist: {model_path}")
         return
     
-    # Collect all metrics
-    iter1_data = []
-    iter6000_data = []
+    # Collect all metrics as columns
+    frames = []
+    iterations = []
+    psnrs = []
+    dssims_1 = []
+    dssims_2 = []
+    lpipss_alex = []
     missing_frames = []
     
     print(f"Collecting metrics from frames {args.start} to {args.end}...")
-    for frame_num in tqdm(range(args.start, args.end + 1)):
-        frame_dir = model_path / f"frame_{frame_num}"
-        results_file = frame_dir / "results.json"
-        
-        if not results_file.exists():
+    frame_nums = range(args.start, args.end + 1)
+    # results.json files are tiny, reading them is dominated by per-file I/O latency
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(tqdm(executor.map(partial(load_frame, model_path), frame_nums), total=len(frame_nums)))
+    
+    for frame_num, rows in zip(frame_nums, results):
+        if rows is None:
             missing_frames.append(frame_num)
             continue
-        
-        try:
-            with open(results_file, 'r') as f:
-                results = json.load(f)
-            
-            # Extract metrics for each iteration
-            for iteration_key, metrics in results.items():
-                # Extract iteration number from key like "ours_1000"
-                iteration = int(iteration_key.replace("ours_", ""))
-                
-                if iteration == 1:
-                    row = {
-                        'frame': frame_num,
-                        'iteration': int(iteration),
-                        'PSNR': metrics.get('PSNR', None),
-                        'DSSIM_1': metrics.get('DSSIM_1', None),
-                        'DSSIM_2': metrics.get('DSSIM_2', None),
-                        'LPIPS_alex': metrics.get('LPIPS_alex', None)
-                    }
-                    iter1_data.append(row)
-                
-                if iteration == 6000:
-                    row = {
-                        'iteration': int(iteration),
-                        'frame': frame_num,
-                        'PSNR': metrics.get('PSNR', None),
-                        'DSSIM_1': metrics.get('DSSIM_1', None),
-                        'DSSIM_2': metrics.get('DSSIM_2', None),
-                        'LPIPS_alex': metrics.get('LPIPS_alex', None)
-                    }
-                    iter6000_data.append(row)
-        
-        except Exception as e:
-            print(f"Error reading frame {frame_num}: {e}")
-            missing_frames.append(frame_num)
+        for iteration, psnr, dssim_1, dssim_2, lpips_alex in rows:
+            frames.append(frame_num)
+            iterations.append(iteration)
+            psnrs.append(psnr)
+            dssims_1.append(dssim_1)
+            dssims_2.append(dssim_2)
+            lpipss_alex.append(lpips_alex)
     
-    all_data = iter1_data + iter6000_data
-    
-    if not all_data:
+    if not frames:
         print("Error: No data collected!")
         return
     
-    # Create DataFrame
-    df = pd.DataFrame(all_data)
+    # Create DataFrame from typed columns (missing metrics become NaN)
+    frames = np.asarray(frames, dtype=np.int32)
+    iterations = np.asarray(iterations, dtype=np.int32)
     
-    # Sort by frame and iteration
-    df = df.sort_values(['iteration', 'frame'])
+    # Sort by iteration, then frame
+    order = np.lexsort((frames, iterations))
+    df = pd.DataFrame({
+        'frame': frames[order],
+        'iteration': iterations[order],
+        'PSNR': np.asarray(psnrs, dtype=np.float64)[order],
+        'DSSIM_1': np.asarray(dssims_1, dtype=np.float64)[order],
+        'DSSIM_2': np.asarray(dssims_2, dtype=np.float64)[order],
+        'LPIPS_alex': np.asarray(lpipss_alex, dtype=np.float64)[order],
+    })
     
     print(f"\nCollected {len(df)} metric entries from {df['frame'].nunique()} frames")
     if missing_frames:
@@ -107,29 +138,17 @@ def main():
         df.to_excel(writer, sheet_name='All Data', index=False)
         
         # Sheet 2-4: Pivot tables for each metric
-        for metric in ['PSNR', 'DSSIM_1', 'DSSIM_2', 'LPIPS_alex']:
+        for metric in METRIC_KEYS:
             pivot = df.pivot(index='frame', columns='iteration', values=metric)
             pivot = pivot.sort_index(axis=1)  # Sort columns by iteration
             pivot.to_excel(writer, sheet_name=metric)
         
         # Sheet 5: Summary statistics
-        summary_data = []
-        for iteration in sorted(df['iteration'].unique()):
-            iter_df = df[df['iteration'] == iteration]
-            summary_data.append({
-                'iteration': iteration,
-                'PSNR_mean': iter_df['PSNR'].mean(),
-                'PSNR_std': iter_df['PSNR'].std(),
-                'DSSIM_1_mean': iter_df['DSSIM_1'].mean(),
-                'DSSIM_1_std': iter_df['DSSIM_1'].std(),
-                'DSSIM_2_mean': iter_df['DSSIM_2'].mean(),
-                'DSSIM_2_std': iter_df['DSSIM_2'].std(),
-                'LPIPS_alex_mean': iter_df['LPIPS_alex'].mean(),
-                'LPIPS_alex_std': iter_df['LPIPS_alex'].std(),
-                'num_frames': len(iter_df)
-            })
-        
-        summary_df = pd.DataFrame(summary_data)
+        grouped = df.groupby('iteration', sort=True)
+        summary_df = grouped[list(METRIC_KEYS)].agg(['mean', 'std'])
+        summary_df.columns = [f"{metric}_{stat}" for metric, stat in summary_df.columns]
+        summary_df['num_frames'] = grouped.size()
+        summary_df = summary_df.reset_index()
         summary_df.to_excel(writer, sheet_name='Summary', index=False)
     
     print(f"\nExcel file saved to: {output_path}")
@@ -17,8 +17,8 @@ import os
 from PIL import Image
 import torch
 import torchvision.transforms.functional as tf
-from utils.loss_utils import ssim
-from lpipsPyTorch import lpips
+from utils.loss_utils import ssim_batched
+from lpipsPyTorch import LPIPS
 import json
 from tqdm import tqdm
 from utils.image_utils import psnr
@@ -31,12 +31,24 @@ def readImages(renders_dir, gt_dir):
     for fname in os.listdir(renders_dir):
         render = Image.open(renders_dir / fname)
         gt = Image.open(gt_dir / fname)
-        renders.append(tf.to_tensor(render).unsqueeze(0)[:, :3, :, :].cuda())
-        gts.append(tf.to_tensor(gt).unsqueeze(0)[:, :3, :, :].cuda())
+        renders.append(tf.to_tensor(render).unsqueeze(0)[:, :3, :, :])
+        gts.append(tf.to_tensor(gt).unsqueeze(0)[:, :3, :, :])
         image_names.append(fname)
     return renders, gts, image_names
 
-def evaluate(model_paths):
+def imageBatches(renders, gts, batch_size):
+    """Yields (indices, render_batch, gt_batch) on the GPU, batching only images of equal resolution."""
+    groups = {}
+    for idx, render in enumerate(renders):
+        groups.setdefault(tuple(render.shape), []).append(idx)
+    for indices in groups.values():
+        for start in range(0, len(indices), batch_size):
+            batch_indices = indices[start:start + batch_size]
+            render_batch = torch.cat([renders[idx] for idx in batch_indices], 0).cuda()
+            gt_batch = torch.cat([gts[idx] for idx in batch_indices], 0).cuda()
+            yield batch_indices, render_batch, gt_batch
+
+def evaluate(model_paths, batch_size=8):
 
     full_dict = {}
     per_view_dict = {}
@@ -44,6 +56,9 @@ def evaluate(model_paths):
     per_view_dict_polytopeonly = {}
     print("")
 
+    lpips_vgg = LPIPS('vgg').cuda().eval()
+    lpips_alex = LPIPS('alex').cuda().eval()
+
     for scene_dir in model_paths:
         try:
             print("Scene:", scene_dir)
@@ -68,42 +83,45 @@ def evaluate(model_paths):
                 renders_dir = method_dir / "renders"
                 renders, gts, image_names = readImages(renders_dir, gt_dir)
 
-                psnrs = []
-                ssims_1 = []
-                ssims_2 = []
-                lpipss_vgg = []
-                lpipss_alex = []
-
-                for idx in tqdm(range(len(renders)), desc="Metric evaluation progress"):
-                    psnrs.append(psnr(renders[idx], gts[idx]))
-                    ssims_1.append(ssim(renders[idx], gts[idx], 1))
-                    ssims_2.append(ssim(renders[idx], gts[idx], 2))
-                    lpipss_vgg.append(lpips(renders[idx], gts[idx], net_type='vgg'))
-                    lpipss_alex.append(lpips(renders[idx], gts[idx], net_type='alex'))
+                psnrs = torch.empty(len(renders))
+                ssims_1 = torch.empty(len(renders))
+                ssims_2 = torch.empty(len(renders))
+                lpipss_vgg = torch.empty(len(renders))
+                lpipss_alex = torch.empty(len(renders))
+
+                with torch.no_grad():
+                    for indices, render_batch, gt_batch in tqdm(imageBatches(renders, gts, batch_size),
+                                                                desc="Metric evaluation progress"):
+                        psnrs[indices] = psnr(render_batch, gt_batch).flatten().cpu()
+                        ssim_1, ssim_2 = ssim_batched(render_batch, gt_batch, (1, 2))
+                        ssims_1[indices] = ssim_1.cpu()
+                        ssims_2[indices] = ssim_2.cpu()
+                        lpipss_vgg[indices] = lpips_vgg(render_batch, gt_batch).flatten().cpu()
+                        lpipss_alex[indices] = lpips_alex(render_batch, gt_batch).flatten().cpu()
 
                 # print("  SSIM : {:>12.7f}".format(torch.tensor(ssims).mean(), ".5"))
-                print("  PSNR : {:>12.7f}".format(torch.tensor(psnrs).mean(), ".5"))
-                print("  DSSIM_1 : {:>12.7f}".format((1.0-torch.tensor(ssims_1).mean())/2.0, ".5"))
-                print("  DSSIM_2 : {:>12.7f}".format((1.0-torch.tensor(ssims_2).mean())/2.0, ".5"))
-                print("  LPIPS_vgg: {:>12.7f}".format(torch.tensor(lpipss_vgg).mean(), ".5"))
-                print("  LPIPS_alex: {:>12.7f}".format(torch.tensor(lpipss_alex).mean(), ".5"))
+                print("  PSNR : {:>12.7f}".format(psnrs.mean(), ".5"))
+                print("  DSSIM_1 : {:>12.7f}".format((1.0-ssims_1.mean())/2.0, ".5"))
+                print("  DSSIM_2 : {:>12.7f}".format((1.0-ssims_2.mean())/2.0, ".5"))
+                print("  LPIPS_vgg: {:>12.7f}".format(lpipss_vgg.mean(), ".5"))
+                print("  LPIPS_alex: {:>12.7f}".format(lpipss_alex.mean(), ".5"))
                 print("")
 
                 full_dict[scene_dir][method].update({
                     # "SSIM": torch.tensor(ssims).mean().item(),
-                    "PSNR": torch.tensor(psnrs).mean().item(),
-                    "DSSIM_1": (1.0 - torch.tensor(ssims_1).mean().item()) / 2.0,
-                    "DSSIM_2": (1.0 - torch.tensor(ssims_2).mean().item()) / 2.0,
-                    "LPIPS_vgg": torch.tensor(lpipss_vgg).mean().item(),
-                    "LPIPS_alex": torch.tensor(lpipss_alex).mean().item(),
+                    "PSNR": psnrs.mean().item(),
+                    "DSSIM_1": (1.0 - ssims_1.mean().item()) / 2.0,
+                    "DSSIM_2": (1.0 - ssims_2.mean().item()) / 2.0,
+                    "LPIPS_vgg": lpipss_vgg.mean().item(),
+                    "LPIPS_alex": lpipss_alex.mean().item(),
                 })
                 per_view_dict[scene_dir][method].update({
                     # "SSIM": {name: ssim for ssim, name in zip(torch.tensor(ssims).tolist(), image_names)},
-                    "PSNR": {name: psnr for psnr, name in zip(torch.tensor(psnrs).tolist(), image_names)},
-                    "DSSIM_1": {name: (1.0-ssim)/2.0 for ssim, name in zip(torch.tensor(ssims_1).tolist(), image_names)},
-                    "DSSIM_2": {name: (1.0-ssim)/2.0 for ssim, name in zip(torch.tensor(ssims_2).tolist(), image_names)},
-                    "LPIPS_vgg": {name: lp for lp, name in zip(torch.tensor(lpipss_vgg).tolist(), image_names)},
-                    "LPIPS_alex": {name: lp for lp, name in zip(torch.tensor(lpipss_alex).tolist(), image_names)},
+                    "PSNR": {name: psnr for psnr, name in zip(psnrs.tolist(), image_names)},
+                    "DSSIM_1": {name: (1.0-ssim)/2.0 for ssim, name in zip(ssims_1.tolist(), image_names)},
+                    "DSSIM_2": {name: (1.0-ssim)/2.0 for ssim, name in zip(ssims_2.tolist(), image_names)},
+                    "LPIPS_vgg": {name: lp for lp, name in zip(lpipss_vgg.tolist(), image_names)},
+                    "LPIPS_alex": {name: lp for lp, name in zip(lpipss_alex.tolist(), image_names)},
                 })
 
             with open(scene_dir + "/results.json", 'w') as fp:
@@ -58,21 +58,24 @@ def training(dataset, opt, pipe, testing_iterations, saving_iterations, checkpoi
     fps = 30
     t = frame_num / fps
     
+    means_t = freetimegs.temporal_means(t)
+    opacities_logit_t = freetimegs.temporal_opacity_logit(t)
+
     valid_bool = freetimegs.temporal_opacity(t).squeeze(-1) > 0.005
     static_bool = static_bool_original
     dynamic_bool = ~static_bool_original & valid_bool       
 
-    static_means = freetimegs.temporal_means(t)[static_bool]
+    static_means = means_t[static_bool]
     static_scales = freetimegs.scales[static_bool]
     static_quats = freetimegs.quats[static_bool]
-    static_opacities = freetimegs.temporal_opacity_logit(t)[static_bool]
+    static_opacities = opacities_logit_t[static_bool]
     static_sh_0 = freetimegs.sh_0[static_bool]
     static_sh_n = freetimegs.sh_n[static_bool]
 
-    dynamic_means = freetimegs.temporal_means(t)[dynamic_bool]
+    dynamic_means = means_t[dynamic_bool]
     dynamic_scales = freetimegs.scales[dynamic_bool]
     dynamic_quats = freetimegs.quats[dynamic_bool]
-    dynamic_opacities = freetimegs.temporal_opacity_logit(t)[dynamic_bool]
+    dynamic_opacities = opacities_logit_t[dynamic_bool]
     dynamic_sh_0 = freetimegs.sh_0[dynamic_bool]
     dynamic_sh_n = freetimegs.sh_n[dynamic_bool]
     
@@ -344,6 +347,10 @@ if __name__ == "__main__":
     
     print("Optimizing " + args.model_path)
 
+    # Merged / masked gaussian sets vary in size; let the caching allocator grow
+    # segments instead of fragmenting (must be set before CUDA is initialized)
+    os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True")
+
     # Initialize system state (RNG)
     safe_state(args.quiet)
 
@@ -8,11 +8,84 @@ Usage:
 
 import os
 import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import cv2
 import numpy as np
 from tqdm import tqdm
 
+try:
+    import av
+    AV_AVAILABLE = True
+except ImportError:
+    AV_AVAILABLE = False
+
+# PyAV encoders in order of preference (NVENC first, CPU x264 as fallback)
+AV_CODECS = [
+    ('h264_nvenc', 'H.264 (NVENC)'),
+    ('libx264', 'H.264 (libx264)'),
+]
+
+
+def open_av_writer(output_path, fps, width, height):
+    """Opens a PyAV container with the first encoder that initializes, or returns None."""
+    for codec, codec_name in AV_CODECS:
+        container = None
+        try:
+            container = av.open(str(output_path), mode='w')
+            stream = container.add_stream(codec, rate=fps)
+            stream.width = width
+            stream.height = height
+            stream.pix_fmt = 'yuv420p'
+            stream.codec_context.open()
+        except Exception:
+            if container is not None:
+                container.close()
+            continue
+        print(f"Using codec: {codec_name}")
+        return container, stream
+    return None
+
+
+# cv2.VideoWriter FourCCs in order of preference
+CV2_CODECS = [
+    ('X264', 'H.264'),
+    ('avc1', 'H.264 (avc1)'),
+    ('XVID', 'XVID'),
+    ('MJPG', 'Motion JPEG'),
+    ('mp4v', 'MPEG-4')
+]
+
+
+def open_cv2_writer(output_path, fps, width, height):
+    """Opens a cv2.VideoWriter with the first FourCC that works, or returns None."""
+    for codec, codec_name in CV2_CODECS:
+        try:
+            fourcc = cv2.VideoWriter_fourcc(*codec)
+            out = cv2.VideoWriter(str(output_path), fourcc, fps, (width, height))
+            if out.isOpened():
+                print(f"Using codec: {codec_name}")
+                return out
+            out.release()
+        except:
+            continue
+    return None
+
+
+def read_frames(image_paths, num_workers=8, prefetch=16):
+    """Yields (path, image) in order, decoding at most `prefetch` images ahead on worker threads."""
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        pending = deque()
+        for img_path in image_paths:
+            pending.append((img_path, executor.submit(cv2.imread, img_path)))
+            if len(pending) >= prefetch:
+                path, future = pending.popleft()
+                yield path, future.result()
+        while pending:
+            path, future = pending.popleft()
+            yield path, future.result()
+
 
 def main():
     parser = argparse.ArgumentParser(description="Concatenate rendered images into video")
@@ -74,49 +147,47 @@ def main():
     height, width = first_img.shape[:2]
     print(f"Video resolution: {width}x{height} @ {args.fps} fps")
     
-    # Try multiple codecs in order of preference
-    codecs = [
-        ('X264', 'H.264'),
-        ('avc1', 'H.264 (avc1)'),
-        ('XVID', 'XVID'),
-        ('MJPG', 'Motion JPEG'),
-        ('mp4v', 'MPEG-4')
-    ]
-    
+    # Prefer PyAV (NVENC / libx264), fall back to cv2.VideoWriter
+    av_writer = open_av_writer(output_path, args.fps, width, height) if AV_AVAILABLE else None
     out = None
-    for codec, codec_name in codecs:
-        try:
-            fourcc = cv2.VideoWriter_fourcc(*codec)
-            out = cv2.VideoWriter(str(output_path), fourcc, args.fps, (width, height))
-            if out.isOpened():
-                print(f"Using codec: {codec_name}")
-                break
-            else:
-                out.release()
-                out = None
-        except:
-            continue
-    
-    if out is None or not out.isOpened():
-        print(f"Error: Cannot create video writer for {output_path}")
-        print("Tried codecs: X264, avc1, XVID, MJPG, mp4v")
-        return
+    if av_writer is None:
+        out = open_cv2_writer(output_path, args.fps, width, height)
+        if out is None:
+            tried = (AV_CODECS if AV_AVAILABLE else []) + CV2_CODECS
+            print(f"Error: Cannot create video writer for {output_path}")
+            print(f"Tried codecs: {', '.join(codec for codec, _ in tried)}")
+            return
     
-    # Write frames
+    # Write frames, decoding upcoming images on worker threads while the current one encodes
     print("Writing video...")
-    for img_path in tqdm(image_paths):
-        img = cv2.imread(img_path)
-        if img is None:
-            print(f"Warning: Cannot read image: {img_path}")
-            continue
-        
-        # Resize if dimensions don't match
-        if img.shape[:2] != (height, width):
-            img = cv2.resize(img, (width, height))
+    cv2.setNumThreads(min(8, os.cpu_count() or 1))
+    try:
+        for img_path, img in tqdm(read_frames(image_paths), total=len(image_paths)):
+            if img is None:
+                print(f"Warning: Cannot read image: {img_path}")
+                continue
+            
+            # Resize if dimensions don't match
+            if img.shape[:2] != (height, width):
+                img = cv2.resize(img, (width, height))
+            
+            if av_writer is not None:
+                container, stream = av_writer
+                frame = av.VideoFrame.from_ndarray(img, format='bgr24')
+                for packet in stream.encode(frame):
+                    container.mux(packet)
+            else:
+                out.write(img)
         
-        out.write(img)
-    
-    out.release()
+        if av_writer is not None:
+            container, stream = av_writer
+            for packet in stream.encode():
+                container.mux(packet)
+    finally:
+        if av_writer is not None:
+            av_writer[0].close()
+        else:
+            out.release()
     print(f"Video saved to: {output_path}")
     print(f"Total frames written: {len(image_paths)}")
 
@@ -53,17 +53,21 @@ def create_window(window_size, channel):
     window = Variable(_2D_window.expand(channel, 1, window_size, window_size).contiguous())
     return window
 
-def ssim(img1, img2, data_range, window_size=11, size_average=True):
-    channel = img1.size(-3)
+def _window_like(img, window_size, channel):
     window = create_window(window_size, channel)
 
-    if img1.is_cuda:
-        window = window.cuda(img1.get_device())
-    window = window.type_as(img1)
+    if img.is_cuda:
+        window = window.cuda(img.get_device())
+    return window.type_as(img)
+
+def ssim(img1, img2, data_range, window_size=11, size_average=True):
+    channel = img1.size(-3)
+    window = _window_like(img1, window_size, channel)
 
     return _ssim(img1, img2, data_range, window, window_size, channel, size_average)
 
-def _ssim(img1, img2, data_range, window, window_size, channel, size_average=True):
+def _ssim_maps(img1, img2, window, window_size, channel):
+    """Filtered mean / variance maps shared by every data range."""
     mu1 = F.conv2d(img1, window, padding=window_size // 2, groups=channel)
     mu2 = F.conv2d(img2, window, padding=window_size // 2, groups=channel)
 
@@ -75,6 +79,15 @@ def _ssim(img1, img2, data_range, window, window_size, channel, size_average=Tru
     sigma2_sq = F.conv2d(img2 * img2, window, padding=window_size // 2, groups=channel) - mu2_sq
     sigma12 = F.conv2d(img1 * img2, window, padding=window_size // 2, groups=channel) - mu1_mu2
 
+    return mu1_sq, mu2_sq, mu1_mu2, sigma1_sq, sigma2_sq, sigma12
+
+def _ssim_map(maps, C1, C2):
+    mu1_sq, mu2_sq, mu1_mu2, sigma1_sq, sigma2_sq, sigma12 = maps
+    return ((2 * mu1_mu2 + C1) * (2 * sigma12 + C2)) / ((mu1_sq + mu2_sq + C1) * (sigma1_sq + sigma2_sq + C2))
+
+def _ssim(img1, img2, data_range, window, window_size, channel, size_average=True):
+    maps = _ssim_maps(img1, img2, window, window_size, channel)
+
     # DSSIM1
     if data_range == 1:
         C1 = 0.01 ** 2
@@ -86,13 +99,30 @@ def _ssim(img1, img2, data_range, window, window_size, channel, size_average=Tru
     else:
         raise ValueError("Data range must be 1 or 2")
 
-    ssim_map = ((2 * mu1_mu2 + C1) * (2 * sigma12 + C2)) / ((mu1_sq + mu2_sq + C1) * (sigma1_sq + sigma2_sq + C2))
+    ssim_map = _ssim_map(maps, C1, C2)
 
     if size_average:
         return ssim_map.mean()
     else:
         return ssim_map.mean(1).mean(1).mean(1)
 
+def ssim_batched(img1, img2, data_ranges=(1, 2), window_size=11):
+    """Per-image SSIM of (N, C, H, W) batches for several data ranges.
+
+    The data range only enters through C1/C2, so the filtered mean and
+    variance maps are computed once and shared by every data range.
+    """
+    channel = img1.size(-3)
+    window = _window_like(img1, window_size, channel)
+    maps = _ssim_maps(img1, img2, window, window_size, channel)
+
+    ssims = []
+    for data_range in data_ranges:
+        C1 = (0.01 * data_range) ** 2
+        C2 = (0.03 * data_range) ** 2
+        ssims.append(_ssim_map(maps, C1, C2).mean(1).mean(1).mean(1))
+    return tuple(ssims)
+
 
 def fast_ssim(img1, img2):
     ssim_map = FusedSSIMMap.apply(C1, C2, img1, img2)